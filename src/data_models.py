@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class Telemetry:
     device_id: str
     local_interval_start_time: datetime
@@ -16,7 +16,7 @@ class Telemetry:
     )
 
 
-@dataclass
+@dataclass(slots=True)
 class DialTurns:
     device_id: str
     local_dial_turn_time: datetime
@@ -26,7 +26,7 @@ class DialTurns:
 
 
 # New class to store preference
-@dataclass
+@dataclass(slots=True)
 class DevicePreference:
     device_id: str
     tolerance_label: str
@@ -1,11 +1,26 @@
-from dataclasses import asdict
-from datetime import datetime, timedelta
-from typing import List, Optional
+import dataclasses
+import os
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import chain
+from operator import attrgetter
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 from data_models import DialTurns, Telemetry
 
+try:
+    from numba import njit
+except ImportError:  # numba is optional, fall back to plain Python
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+
 OFFSET_LOW = 0.5
 OFFSET_MED = 0.7
 OFFSET_HIGH = 0.8
@@ -14,14 +29,185 @@ OFFSET_HIGH = 0.8
 LOW_TOLERANCE_RATE = 0.50
 MED_TOLERANCE_RATE = 0.25
 
+# tolerance label codes, L=0, M=1, H=2; code = number of thresholds the override
+# rate stays below
+_TOLERANCE_CUTS = (MED_TOLERANCE_RATE, LOW_TOLERANCE_RATE)
+_TOLERANCE_LABELS = "LMH"
+
 LOOKBACK_DAYS = 14  # Only query data from last N days
 HALF_LIFE_DAYS = 7  # for EWMA calc
 
 INTERVAL_MIN = 15
+NS_PER_DAY = 86400 * 10**9
+
+# keep NaN semantics (the kernels check for NaN offsets), so no "nnan"/"ninf" here
+_FASTMATH = {"reassoc", "contract", "arcp", "nsz"}
+
+# fields (and dtypes) used by the metrics pipeline
+_TELEM_FIELDS = {
+    "local_interval_start_time": "datetime64[ns]",
+    "schedule_offset_celsius": np.float64,
+}
+_DIAL_FIELDS = {
+    "local_dial_turn_time": "datetime64[ns]",
+}
 
 # TODO: add logging
 
 
+def _datetimes_to_i64(values) -> np.ndarray:
+    """
+    Convert datetimes to int64 nanoseconds since epoch (UTC for tz-aware values).
+    """
+    return pd.to_datetime(list(values), utc=True).as_unit("ns").asi8
+
+
+def _datetime_to_i64(value: datetime) -> int:
+    """
+    Convert one datetime with the same convention as _datetimes_to_i64.
+    """
+    return pd.Timestamp(value).as_unit("ns").value
+
+
+def _i64_to_datetime(values: np.ndarray, dtype) -> pd.Series:
+    """
+    Convert int64 nanosecond epoch values back to a datetime Series of the given dtype
+    (keeps the resolution and timezone of the source column).
+    """
+    tz = getattr(dtype, "tz", None)
+    return pd.Series(pd.to_datetime(values, utc=tz is not None)).astype(dtype)
+
+
+@njit(cache=True, nogil=True)
+def _match_dial_turns(
+    dial_ts: np.ndarray, ev_start: np.ndarray, ev_end: np.ndarray
+) -> tuple:
+    """
+    Single monotonic pass over sorted int64 dial turn times and sorted, non-overlapping
+    offset events. A dial turn is an override if ev_start <= dial_ts < ev_end.
+    Returns (number of override dial turns, overridden per event).
+    """
+    n_events = len(ev_start)
+    n_overrides = 0
+    overridden = np.zeros(n_events, dtype=np.bool_)
+    j = 0
+    for i in range(len(dial_ts)):
+        t = dial_ts[i]
+        # events ending at or before this dial turn can't contain any later turn
+        while j < n_events and ev_end[j] <= t:
+            j += 1
+        if j < n_events and ev_start[j] <= t:
+            n_overrides += 1
+            overridden[j] = True
+    return n_overrides, overridden
+
+
+@njit(cache=True, nogil=True, fastmath=_FASTMATH)
+def _compute_metrics_kernel(
+    ts_i64: np.ndarray,
+    offset_c: np.ndarray,
+    dial_ts_i64: np.ndarray,
+    as_of_i64: int,
+    inv_half_life: float,
+    cutoff_i64: int,
+) -> tuple:
+    """
+    Per-device metrics kernel: segment offset events, match dial turns to events and
+    reduce the EWMA override rate. Returns (n_events, n_overrides, ewma_rate).
+    """
+    interval_ns = INTERVAL_MIN * 60 * 10**9
+
+    # intervals within the lookback window with an active offset, only sorted if the
+    # input was out of order
+    ts = np.empty(len(ts_i64), dtype=np.int64)
+    n = 0
+    ts_sorted = True
+    for i in range(len(ts_i64)):
+        off = offset_c[i]
+        if ts_i64[i] >= cutoff_i64 and off != 0.0 and not np.isnan(off):
+            if n > 0 and ts_i64[i] < ts[n - 1]:
+                ts_sorted = False
+            ts[n] = ts_i64[i]
+            n += 1
+    ts = ts[:n]
+    if not ts_sorted:
+        ts = np.sort(ts)
+
+    dial_ts = np.empty(len(dial_ts_i64), dtype=np.int64)
+    m = 0
+    dial_sorted = True
+    for i in range(len(dial_ts_i64)):
+        if dial_ts_i64[i] >= cutoff_i64:
+            if m > 0 and dial_ts_i64[i] < dial_ts[m - 1]:
+                dial_sorted = False
+            dial_ts[m] = dial_ts_i64[i]
+            m += 1
+    dial_ts = dial_ts[:m]
+    if not dial_sorted:
+        dial_ts = np.sort(dial_ts)
+
+    # new event when the gap between intervals > INTERVAL_MIN
+    ev_start = np.empty(n, dtype=np.int64)
+    ev_end = np.empty(n, dtype=np.int64)
+    n_events = 0
+    for i in range(n):
+        if n_events == 0 or ts[i] > ev_end[n_events - 1]:
+            ev_start[n_events] = ts[i]
+            n_events += 1
+        ev_end[n_events - 1] = ts[i] + interval_ns
+    ev_start = ev_start[:n_events]
+    ev_end = ev_end[:n_events]
+
+    n_overrides, overridden = _match_dial_turns(dial_ts, ev_start, ev_end)
+    if n_overrides == 0:
+        return n_events, 0, 0.0
+
+    # EWMA over events, weight = 2^(-age / half_life) with age taken straight from the
+    # int64 ns difference
+    decay_per_ns = inv_half_life / NS_PER_DAY
+    w_sum = 0.0
+    w_overridden = 0.0
+    for j in range(n_events):
+        w = np.exp2(-float(as_of_i64 - ev_start[j]) * decay_per_ns)
+        w_sum += w
+        if overridden[j]:
+            w_overridden += w
+    return n_events, n_overrides, w_overridden / w_sum
+
+
+@njit(cache=True, nogil=True, fastmath=_FASTMATH)
+def _compute_metrics_batch_kernel(
+    telem_bounds: np.ndarray,
+    ts_i64: np.ndarray,
+    offset_c: np.ndarray,
+    dial_bounds: np.ndarray,
+    dial_ts_i64: np.ndarray,
+    as_of_i64: int,
+    inv_half_life: float,
+    cutoff_i64: int,
+) -> tuple:
+    """
+    Run _compute_metrics_kernel over each device segment of the flattened arrays.
+    Device i owns ts_i64[telem_bounds[i]:telem_bounds[i + 1]] (same for dial turns).
+    """
+    n_devices = len(telem_bounds) - 1
+    n_events = np.zeros(n_devices, dtype=np.int64)
+    n_overrides = np.zeros(n_devices, dtype=np.int64)
+    rates = np.zeros(n_devices, dtype=np.float64)
+    for i in range(n_devices):
+        t0, t1 = telem_bounds[i], telem_bounds[i + 1]
+        d0, d1 = dial_bounds[i], dial_bounds[i + 1]
+        n_events[i], n_overrides[i], rates[i] = _compute_metrics_kernel(
+            ts_i64[t0:t1],
+            offset_c[t0:t1],
+            dial_ts_i64[d0:d1],
+            as_of_i64,
+            inv_half_life,
+            cutoff_i64,
+        )
+    return n_events, n_overrides, rates
+
+
 class Personalizer:
     def __init__(
         self,
@@ -33,13 +219,93 @@ class Personalizer:
         self.ewma_half_life_days = ewma_half_life_days
         self.override_magnitude_thresh = override_magnitude_thresh
 
+        # config is fixed after init, so bind the kernel constants once
+        self.inv_half_life = 1.0 / ewma_half_life_days
+        self._lookback_ns = int(lookback_days * NS_PER_DAY)
+
         # map labels to offsets in degrees C
         self.offset_map = {"L": OFFSET_LOW, "M": OFFSET_MED, "H": OFFSET_HIGH}
+        self._offsets_by_code = np.array(
+            [self.offset_map[label] for label in _TOLERANCE_LABELS], dtype=np.float64
+        )
 
     def _rows_to_df(self, rows: list) -> pd.DataFrame:
+        # NOTE: legacy DataFrame path, the metrics pipeline uses _rows_to_arrays
         if not rows:
             return pd.DataFrame()
-        return pd.DataFrame([asdict(r) for r in rows])
+        # read fields straight off the rows instead of building a dict per row
+        columns = tuple(f.name for f in dataclasses.fields(rows[0]))
+        return pd.DataFrame.from_records(
+            map(attrgetter(*columns), rows), columns=columns
+        )
+
+    def _rows_to_arrays(self, rows: list, fields: dict) -> tuple:
+        """
+        Build one NumPy array per requested field (struct-of-arrays) in a single pass
+        over the rows. fields maps field name -> dtype; datetime fields are returned
+        as int64 nanoseconds since epoch (UTC for tz-aware values).
+        """
+        if not rows:
+            return tuple(
+                np.empty(0, np.int64 if dtype == "datetime64[ns]" else dtype)
+                for dtype in fields.values()
+            )
+
+        # attrgetter returns a bare value (not a tuple) for a single field
+        getter = attrgetter(*fields)
+        if len(fields) == 1:
+            columns = (list(map(getter, rows)),)
+        else:
+            columns = zip(*map(getter, rows))
+        return tuple(
+            (
+                _datetimes_to_i64(col)
+                if dtype == "datetime64[ns]"
+                else np.asarray(col, dtype)
+            )
+            for col, dtype in zip(columns, fields.values())
+        )
+
+    def _offset_event_arrays(
+        self, device_ids: np.ndarray, ts_i64: np.ndarray, offset_c: np.ndarray
+    ) -> tuple:
+        """
+        Get "offset events" from telemetry arrays. Offset events are defined as
+        continuous time periods when a scheduled offset was active.
+        Returns (device_ids, offset_start, offset_end) arrays sorted by device and time.
+
+        NOTE: only kept for the legacy DataFrame API (_get_offset_events), which can
+        mix devices. The metrics pipeline segments events per device inside
+        _compute_metrics_kernel.
+        """
+        # filter to only intervals with active offset (NaN counts as no offset)
+        keep = (offset_c != 0.0) & ~np.isnan(offset_c)
+        device_ids = device_ids[keep]
+        ts_i64 = ts_i64[keep]
+        if not len(ts_i64):
+            return device_ids, ts_i64, ts_i64
+
+        # sort intervals by (device, time), skipped when they already arrive in order
+        same_dev = device_ids[1:] == device_ids[:-1]
+        in_order = np.where(
+            same_dev, ts_i64[1:] >= ts_i64[:-1], device_ids[1:] > device_ids[:-1]
+        )
+        if not in_order.all():
+            order = np.lexsort((ts_i64, device_ids))
+            device_ids = device_ids[order]
+            ts_i64 = ts_i64[order]
+            same_dev = device_ids[1:] == device_ids[:-1]
+
+        # new event on a device change or when the gap between intervals > INTERVAL_MIN
+        interval_ns = INTERVAL_MIN * 60 * 10**9
+        gap = (ts_i64[1:] - ts_i64[:-1]) > interval_ns
+        new_event = ~same_dev | gap
+        starts = np.flatnonzero(np.concatenate(([True], new_event)))
+
+        # get offset events from the boundary indices of each run
+        offset_start = ts_i64[starts]
+        offset_end = np.maximum.reduceat(ts_i64, starts) + interval_ns
+        return device_ids[starts], offset_start, offset_end
 
     def _get_offset_events(self, telem_df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -50,32 +316,53 @@ class Personalizer:
         if telem_df.empty:
             return pd.DataFrame(columns=cols)
 
-        # filter to only intervals with active offset
-        df = telem_df.sort_values("local_interval_start_time").copy()
-        df = df.loc[df["schedule_offset_celsius"].fillna(0) != 0]
-        if df.empty:
+        ts_dtype = telem_df["local_interval_start_time"].dtype
+        device_ids, offset_start, offset_end = self._offset_event_arrays(
+            telem_df["device_id"].to_numpy(),
+            telem_df["local_interval_start_time"].to_numpy("datetime64[ns]").view("i8"),
+            telem_df["schedule_offset_celsius"].to_numpy(np.float64),
+        )
+        if not len(offset_start):
             return pd.DataFrame(columns=cols)
 
-        # find new events when the gap between intervals > INTERVAL_MIN
-        df["prev_end"] = df["local_interval_start_time"].shift() + pd.Timedelta(
-            seconds=INTERVAL_MIN * 60
+        return pd.DataFrame(
+            {
+                "device_id": device_ids,
+                "offset_start": _i64_to_datetime(offset_start, ts_dtype),
+                "offset_end": _i64_to_datetime(offset_end, ts_dtype),
+            }
         )
-        df["new_event"] = (df["local_interval_start_time"] > df["prev_end"]).astype(int)
-        df["event_id"] = df["new_event"].cumsum()
-
-        # get offset events from intervals
-        events = (
-            df.groupby(["device_id", "event_id"])
-            .agg(
-                offset_start=("local_interval_start_time", "min"),
-                offset_end=(
-                    "local_interval_start_time",
-                    lambda s: s.max() + pd.Timedelta(minutes=INTERVAL_MIN),
-                ),
-            )
-            .reset_index(drop=True)
+
+    def _resolve_as_of(
+        self, telem_rows: List[Telemetry], as_of: Optional[datetime]
+    ) -> datetime:
+        # intervals are recorded in device local time, so use that here
+        device_local_tz = (
+            telem_rows[0].local_interval_start_time.tzinfo if telem_rows else None
         )
-        return events
+        if as_of is not None:
+            # naive values are stored as wall time, so mixing them with tz-aware
+            # ones would silently shift the lookback window
+            if telem_rows and (as_of.tzinfo is None) != (device_local_tz is None):
+                raise ValueError(
+                    "as_of and telemetry timestamps must both be tz-aware or both naive"
+                )
+            return as_of
+        if device_local_tz is not None:
+            return datetime.now(device_local_tz)
+        return datetime.now()
+
+    def resolve_as_of(
+        self,
+        telem_by_dev: Dict[str, List[Telemetry]],
+        as_of: Optional[datetime] = None,
+    ) -> datetime:
+        """
+        Resolve as_of (default now) for a batch of devices, taking the local timezone
+        from the first device that has telemetry.
+        """
+        first_rows = next((rows for rows in telem_by_dev.values() if rows), [])
+        return self._resolve_as_of(first_rows, as_of)
 
     def compute_metrics(
         self,
@@ -88,107 +375,39 @@ class Personalizer:
         a time-decay EWMA over offset events, where an event is counted as overridden if a dial turn
         occurs during the offset event.
         """
-        # intervals are recorded in device local time, so use that here
-        device_local_tz = (
-            telem_rows[0].local_interval_start_time.tzinfo if telem_rows else None
-        )
-        if as_of is None:
-            if device_local_tz is not None:
-                as_of = datetime.now(device_local_tz)
-            else:
-                as_of = datetime.now()
+        # no telemetry means no offset events, nothing to compute
+        if not telem_rows:
+            return {"n_offset_events": 0, "override_rate": 0.0, "n_overrides": 0}
 
-        telem_df = self._rows_to_df(telem_rows)
-        dial_df = self._rows_to_df(dial_turn_rows)
+        as_of_i64 = _datetime_to_i64(self._resolve_as_of(telem_rows, as_of))
+        telem_ts, offset_c = self._rows_to_arrays(telem_rows, _TELEM_FIELDS)
+        # without dial turns the kernel only segments events and returns a zero rate
+        (dial_ts,) = self._rows_to_arrays(dial_turn_rows, _DIAL_FIELDS)
 
         # NOTE: upstream query should have only retrieved data within lookback window
-        # filtering here just to be safe
-        lookback_cutoff = as_of - timedelta(days=self.lookback_days)
-        if not telem_df.empty:
-            telem_df = telem_df.loc[
-                telem_df["local_interval_start_time"] >= lookback_cutoff
-            ]
-        if not dial_df.empty:
-            dial_df = dial_df.loc[dial_df["local_dial_turn_time"] >= lookback_cutoff]
-
-        # get offset events
-        offset_events = self._get_offset_events(telem_df)
-        n_offset_events = len(offset_events)
-        if offset_events.empty or dial_df.empty:
-            return {
-                "n_offset_events": n_offset_events,
-                "override_rate": 0.0,
-                "mean_override_magnitude": 0.0,
-                "n_overrides": 0,
-            }
-
-        # merge dial turns with offset events to see which overrides happened during offsets
-        if not dial_df.empty:
-            dial_df = dial_df.rename(columns={"local_dial_turn_time": "dial_time"})
-            events_w_overrides = pd.merge_asof(
-                dial_df.sort_values("dial_time"),
-                offset_events.sort_values("offset_start"),
-                left_on="dial_time",
-                right_on="offset_start",
-                direction="backward",
-                tolerance=pd.Timedelta(
-                    minutes=INTERVAL_MIN
-                ),  # only consider dial turns within the offset event
-            )
-            # count as override if events_w_overrides event exists
-            events_w_overrides["is_override"] = events_w_overrides[
-                "offset_start"
-            ].notnull()
-            n_overrides = events_w_overrides["is_override"].sum()
-        else:
-            n_overrides = 0
-
-        # calc override rate using EWMA
-        if n_overrides > 0:
-            offset_events["age_in_days"] = (
-                as_of - offset_events["offset_start"]
-            ).dt.total_seconds() / 86400
-
-            # decay equation
-            offset_events["weight"] = np.exp(
-                -np.log(2) * offset_events["age_in_days"] / self.ewma_half_life_days
-            )
-
-            # did user override this event?
-            offset_events["was_overridden"] = offset_events["offset_start"].isin(
-                events_w_overrides.loc[
-                    events_w_overrides["is_override"], "offset_start"
-                ]
-            )
-
-            # calc override rate
-            ewma_override_rate = (
-                offset_events["was_overridden"] * offset_events["weight"]
-            ).sum() / offset_events["weight"].sum()
-        else:
-            ewma_override_rate = 0.0
-
+        # filtering here (in the kernel) just to be safe
+        n_offset_events, n_overrides, ewma_override_rate = _compute_metrics_kernel(
+            telem_ts,
+            offset_c,
+            dial_ts,
+            as_of_i64,
+            self.inv_half_life,
+            as_of_i64 - self._lookback_ns,
+        )
         return {
-            "n_offset_events": n_offset_events,
-            "override_rate": ewma_override_rate,
-            "n_overrides": n_overrides,
+            "n_offset_events": int(n_offset_events),
+            "override_rate": float(ewma_override_rate),
+            "n_overrides": int(n_overrides),
         }
 
     def score_tolerance_from_metrics(self, metrics) -> str:
         """
         Map override_rate to label
         """
-        r = metrics["override_rate"]
-
-        # thresholds
-        if r >= LOW_TOLERANCE_RATE:
-            label = "L"
-        elif r >= MED_TOLERANCE_RATE:
-            label = "M"
-        else:
-            label = "H"
+        return _TOLERANCE_LABELS[self._tolerance_code(metrics["override_rate"])]
 
-        return label
+    def _tolerance_code(self, override_rate: float) -> int:
+        return len(_TOLERANCE_CUTS) - bisect_right(_TOLERANCE_CUTS, override_rate)
 
     def calculate_preference(
         self,
@@ -200,10 +419,136 @@ class Personalizer:
         Get user tolerance preference based on historical telemetry and dial turn data.
         """
         metrics = self.compute_metrics(telem_rows, dial_turn_rows, as_of=as_of)
-        label = self.score_tolerance_from_metrics(metrics)
-        offset = self.offset_map[label]
+        code = self._tolerance_code(metrics["override_rate"])
         return {
-            "label": label,
-            "offset_celsius": offset,
+            "label": _TOLERANCE_LABELS[code],
+            "offset_celsius": float(self._offsets_by_code[code]),
             "metrics": metrics,
         }
+
+    def calculate_preferences_batch(
+        self,
+        telem_by_dev: Dict[str, List[Telemetry]],
+        dial_by_dev: Dict[str, List[DialTurns]],
+        as_of: Optional[datetime] = None,
+    ) -> Dict[str, dict]:
+        """
+        Get preferences for many devices at once. Rows for all devices are flattened
+        into one set of arrays and the metrics kernel runs over each device's segment,
+        instead of building arrays per device.
+
+        telem_by_dev: {device_id: List[Telemetry]}
+        dial_by_dev: {device_id: List[DialTurns]}
+        """
+        device_ids = list(telem_by_dev)
+        if not device_ids:
+            return {}
+        as_of_i64 = _datetime_to_i64(self.resolve_as_of(telem_by_dev, as_of))
+        telem_bounds, telem_ts, offset_c, dial_bounds, dial_ts = self._batch_arrays(
+            device_ids, telem_by_dev, dial_by_dev
+        )
+        n_events, n_overrides, rates = _compute_metrics_batch_kernel(
+            telem_bounds,
+            telem_ts,
+            offset_c,
+            dial_bounds,
+            dial_ts,
+            as_of_i64,
+            self.inv_half_life,
+            as_of_i64 - self._lookback_ns,
+        )
+        return self._prefs_from_metrics(device_ids, n_events, n_overrides, rates)
+
+    def calculate_preferences_threaded(
+        self,
+        telem_by_dev: Dict[str, List[Telemetry]],
+        dial_by_dev: Dict[str, List[DialTurns]],
+        as_of: Optional[datetime] = None,
+        max_workers: Optional[int] = None,
+    ) -> Dict[str, dict]:
+        """
+        Same as calculate_preferences_batch, but the metrics kernel runs over chunks
+        of devices on a thread pool. The flat arrays are built once on the calling
+        thread; only the kernel calls, which release the GIL, go to the workers.
+        """
+        device_ids = list(telem_by_dev)
+        if not device_ids:
+            return {}
+        as_of_i64 = _datetime_to_i64(self.resolve_as_of(telem_by_dev, as_of))
+        cutoff_i64 = as_of_i64 - self._lookback_ns
+        telem_bounds, telem_ts, offset_c, dial_bounds, dial_ts = self._batch_arrays(
+            device_ids, telem_by_dev, dial_by_dev
+        )
+
+        # each chunk is a slice of the device bounds over the shared flat arrays
+        n_devices = len(device_ids)
+        n_workers = min(max_workers or os.cpu_count() or 1, n_devices)
+        chunk_size = -(-n_devices // n_workers)
+
+        def run_chunk(lo: int) -> tuple:
+            hi = min(lo + chunk_size, n_devices)
+            return _compute_metrics_batch_kernel(
+                telem_bounds[lo : hi + 1],
+                telem_ts,
+                offset_c,
+                dial_bounds[lo : hi + 1],
+                dial_ts,
+                as_of_i64,
+                self.inv_half_life,
+                cutoff_i64,
+            )
+
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            results = list(pool.map(run_chunk, range(0, n_devices, chunk_size)))
+        n_events, n_overrides, rates = (np.concatenate(r) for r in zip(*results))
+        return self._prefs_from_metrics(device_ids, n_events, n_overrides, rates)
+
+    def _batch_arrays(
+        self,
+        device_ids: List[str],
+        telem_by_dev: Dict[str, List[Telemetry]],
+        dial_by_dev: Dict[str, List[DialTurns]],
+    ) -> tuple:
+        """
+        Flatten rows for device_ids into (telem_bounds, telem_ts, offset_c,
+        dial_bounds, dial_ts). Device i owns rows telem_bounds[i]:telem_bounds[i + 1]
+        of the telemetry arrays (same for dial turns).
+        """
+        # rows are already grouped by device, so segment bounds are the running counts
+        telem_groups = [telem_by_dev[d] for d in device_ids]
+        dial_groups = [dial_by_dev.get(d, []) for d in device_ids]
+        telem_bounds = np.cumsum([0] + [len(rows) for rows in telem_groups])
+        dial_bounds = np.cumsum([0] + [len(rows) for rows in dial_groups])
+        telem_ts, offset_c = self._rows_to_arrays(
+            list(chain.from_iterable(telem_groups)), _TELEM_FIELDS
+        )
+        (dial_ts,) = self._rows_to_arrays(
+            list(chain.from_iterable(dial_groups)), _DIAL_FIELDS
+        )
+        return telem_bounds, telem_ts, offset_c, dial_bounds, dial_ts
+
+    def _prefs_from_metrics(
+        self,
+        device_ids: List[str],
+        n_events: np.ndarray,
+        n_overrides: np.ndarray,
+        rates: np.ndarray,
+    ) -> Dict[str, dict]:
+        # map rates to label codes and offsets for all devices at once
+        codes = len(_TOLERANCE_CUTS) - np.searchsorted(
+            _TOLERANCE_CUTS, rates, side="right"
+        )
+        offsets = self._offsets_by_code[codes]
+
+        prefs = {}
+        for i, device_id in enumerate(device_ids):
+            prefs[device_id] = {
+                "label": _TOLERANCE_LABELS[codes[i]],
+                "offset_celsius": float(offsets[i]),
+                "metrics": {
+                    "n_offset_events": int(n_events[i]),
+                    "override_rate": float(rates[i]),
+                    "n_overrides": int(n_overrides[i]),
+                },
+            }
+        return prefs
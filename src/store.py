@@ -1,9 +1,27 @@
+import os
 from datetime import datetime
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import ray
 from data_models import DevicePreference, DialTurns, Telemetry
 from personalizer import OFFSET_LOW, Personalizer
+from ray.util import ActorPool
+
+# above this many devices fan out over the Ray cluster instead of one local batch
+RAY_MIN_DEVICES = 100_000
+RAY_BATCH_SIZE = 1_000  # devices per Ray task
+
+# returned for devices without a stored preference
+_FALLBACK_PREFERENCE = MappingProxyType(
+    {
+        "offset_celsius": OFFSET_LOW,
+        "tolerance_label": "L",
+        "confidence": 0.0,
+        "last_updated": None,
+    }
+)
 
 
 class DevicePreferenceStore:
@@ -16,13 +34,25 @@ class DevicePreferenceStore:
         self.store: Dict[str, DevicePreference] = {}
 
     def update(self, device_id: str, preference: dict):
-        self.store[device_id] = DevicePreference(
-            device_id=device_id,
-            tolerance_label=preference["label"],
-            offset_celsius=preference["offset_celsius"],
-            confidence=preference["confidence"],
-            last_updated=datetime.now(),
-        )
+        self.update_batch([(device_id, preference)])
+
+    def update_batch(
+        self, items: Iterable[Tuple[str, dict]], now: Optional[datetime] = None
+    ):
+        """
+        Store many preferences with one shared last_updated timestamp, instead of
+        reading the clock for every device.
+        """
+        if now is None:
+            now = datetime.now()
+        for device_id, preference in items:
+            self.store[device_id] = DevicePreference(
+                device_id=device_id,
+                tolerance_label=preference["label"],
+                offset_celsius=preference["offset_celsius"],
+                confidence=preference.get("confidence", 0.0),
+                last_updated=now,
+            )
 
     def get(self, device_id: str) -> DevicePreference:
         return self.store.get(device_id)
@@ -30,10 +60,105 @@ class DevicePreferenceStore:
     def batch_get(self, device_ids: List[str]) -> List[DevicePreference]:
         return [self.store.get(d) for d in device_ids]
 
+    def batch_get_arrays(self, device_ids: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Get preferences for many devices as one array per field, for vectorized
+        consumers. Devices without a stored preference get the low tolerance
+        fallback (see retrieve_preferences) and a NaT last_updated.
+        """
+        n = len(device_ids)
+        offsets = np.full(n, OFFSET_LOW, dtype=np.float64)
+        labels = np.full(n, "L", dtype="U1")
+        confidence = np.zeros(n, dtype=np.float64)
+        last_updated = np.full(n, np.datetime64("NaT", "us"))
+        for i, device_id in enumerate(device_ids):
+            pref = self.store.get(device_id)
+            if pref is None:
+                continue
+            offsets[i] = pref.offset_celsius
+            labels[i] = pref.tolerance_label
+            confidence[i] = pref.confidence
+            last_updated[i] = pref.last_updated
+        return {
+            "offset_celsius": offsets,
+            "tolerance_label": labels,
+            "confidence": confidence,
+            "last_updated": last_updated,
+        }
+
 
 @ray.remote
-def compute_pref(device_id, personalizer, telem_rows, dial_rows, as_of):
-    return device_id, personalizer.get_preference(telem_rows, dial_rows, as_of)
+class PersonalizerWorker:
+    """
+    Long-lived worker holding one copy of the personalizer, so it is serialized
+    once per worker instead of once per device.
+    """
+
+    def __init__(self, personalizer: Personalizer):
+        self.personalizer = personalizer
+
+    def process_batch(self, telem_data, dial_data, as_of):
+        prefs = self.personalizer.calculate_preferences_batch(
+            telem_data, dial_data, as_of
+        )
+        return list(prefs.items())
+
+
+# single actor pool reused across precompute runs: (session, config, actors, pool)
+_RAY_POOL: Optional[tuple] = None
+
+
+def _get_ray_pool(personalizer: Personalizer) -> ActorPool:
+    global _RAY_POOL
+    if not ray.is_initialized():
+        ray.init(ignore_reinit_error=True)
+
+    # job ids restart at 1 on a fresh local cluster, the GCS address does not
+    session = ray.get_runtime_context().gcs_address
+    config = (
+        personalizer.lookback_days,
+        personalizer.ewma_half_life_days,
+        personalizer.override_magnitude_thresh,
+    )
+    if _RAY_POOL is not None:
+        pool_session, pool_config, actors, pool = _RAY_POOL
+        if pool_session == session and pool_config == config:
+            return pool
+        # actors from an older Ray session are already gone, only kill live ones
+        if pool_session == session:
+            for actor in actors:
+                ray.kill(actor)
+
+    # one worker per core
+    personalizer_ref = ray.put(personalizer)
+    actors = [
+        PersonalizerWorker.remote(personalizer_ref) for _ in range(os.cpu_count() or 1)
+    ]
+    pool = ActorPool(actors)
+    _RAY_POOL = (session, config, actors, pool)
+    return pool
+
+
+def _precompute_ray(personalizer, telem_data, dial_data, as_of) -> list:
+    pool = _get_ray_pool(personalizer)
+
+    # ~RAY_BATCH_SIZE devices per task, at least one task per worker
+    device_ids = list(telem_data)
+    n_chunks = max(
+        min(os.cpu_count() or 1, len(device_ids)),
+        -(-len(device_ids) // RAY_BATCH_SIZE),
+    )
+    chunks = [
+        (
+            {d: telem_data[d] for d in chunk},
+            {d: dial_data[d] for d in chunk if d in dial_data},
+        )
+        for chunk in np.array_split(np.array(device_ids, dtype=object), n_chunks)
+    ]
+    results = pool.map_unordered(
+        lambda worker, c: worker.process_batch.remote(c[0], c[1], as_of), chunks
+    )
+    return [item for batch in results for item in batch]
 
 
 def precompute_preferences(
@@ -49,21 +174,16 @@ def precompute_preferences(
     telem_data: {device_id: List[Telemetry]}
     dial_data: {device_id: List[DialTurns]}
     """
-    ray.init()
-    futures = [
-        compute_pref.remote(
-            device_id,
-            personalizer,
-            telem_data[device_id],
-            dial_data.get(device_id, []),
-            as_of,
-        )
-        for device_id in telem_data
-    ]
-    results = ray.get(futures)
+    # resolve "now" once so every device (and Ray chunk) uses the same as_of
+    as_of = personalizer.resolve_as_of(telem_data, as_of)
+    if len(telem_data) < RAY_MIN_DEVICES:
+        results = personalizer.calculate_preferences_batch(
+            telem_data, dial_data, as_of
+        ).items()
+    else:
+        results = _precompute_ray(personalizer, telem_data, dial_data, as_of)
     store = DevicePreferenceStore()
-    for device_id, pref in results:
-        store.update(device_id, pref)
+    store.update_batch(results)
     return store
 
 
@@ -77,19 +197,12 @@ def retrieve_preferences(
     to be conservative.
     """
     prefs = []
+    stored = store.store
     for device_id in device_ids:
-        pref = store.get(device_id)
+        pref = stored.get(device_id)
         if pref is None:
             # fallback to low tolerance
-            prefs.append(
-                {
-                    "device_id": device_id,
-                    "offset_celsius": OFFSET_LOW,
-                    "tolerance_label": "L",
-                    "confidence": 0.0,
-                    "last_updated": None,
-                }
-            )
+            prefs.append({"device_id": device_id, **_FALLBACK_PREFERENCE})
         else:
             prefs.append(
                 {
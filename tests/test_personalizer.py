@@ -1,7 +1,15 @@
-from datetime import datetime
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
 
+import numpy as np
 import pytest
-from personalizer import Personalizer, Telemetry
+from personalizer import (
+    _DIAL_FIELDS,
+    _TELEM_FIELDS,
+    DialTurns,
+    Personalizer,
+    Telemetry,
+)
 
 DUMMY_TELEM_ROW = Telemetry(
     device_id="dev1",
@@ -14,9 +22,33 @@ DUMMY_TELEM_ROW = Telemetry(
     schedule_offset_celsius=0.5,
 )
 
+DUMMY_DIAL_ROW = DialTurns(
+    device_id="dev1",
+    local_dial_turn_time=datetime(2025, 10, 6, 12, 5),
+    schedule_offset_celsius=0.5,
+    initial_cooling_target_temperature_celsius=22.0,
+    final_cooling_target_temperature_celsius=21.0,
+)
+
 DUMMY_DIAL_ROWS = []
 
 
+def offset_rows(start: datetime, n_intervals: int, offset: float = 0.5) -> list:
+    """n_intervals contiguous 15 min telemetry rows starting at start"""
+    return [
+        replace(
+            DUMMY_TELEM_ROW,
+            local_interval_start_time=start + timedelta(minutes=15 * i),
+            schedule_offset_celsius=offset,
+        )
+        for i in range(n_intervals)
+    ]
+
+
+def dial_row(t: datetime) -> DialTurns:
+    return replace(DUMMY_DIAL_ROW, local_dial_turn_time=t)
+
+
 def test_rows_to_df():
     personalizer = Personalizer()
     df = personalizer._rows_to_df([DUMMY_TELEM_ROW])
@@ -24,6 +56,20 @@ def test_rows_to_df():
     assert df.iloc[0]["device_id"] == "dev1"
 
 
+def test_rows_to_arrays():
+    personalizer = Personalizer()
+    ts, offset_c = personalizer._rows_to_arrays([DUMMY_TELEM_ROW], _TELEM_FIELDS)
+    assert ts.dtype == np.int64
+    assert ts[0] == np.datetime64("2025-10-06T12:00", "ns").view("i8")
+    assert offset_c.tolist() == [0.5]
+
+    (dial_ts,) = personalizer._rows_to_arrays([DUMMY_DIAL_ROW], _DIAL_FIELDS)
+    assert dial_ts[0] == np.datetime64("2025-10-06T12:05", "ns").view("i8")
+
+    ts, offset_c = personalizer._rows_to_arrays([], _TELEM_FIELDS)
+    assert len(ts) == len(offset_c) == 0
+
+
 def test_get_offset_events():
     personalizer = Personalizer()
     rows = [
@@ -55,6 +101,38 @@ def test_get_offset_events():
     assert df.iloc[0]["offset_end"] == datetime(2025, 10, 6, 12, 30)
 
 
+def test_get_offset_events_multiple_devices():
+    personalizer = Personalizer()
+
+    def row(device_id, hour, minute, offset=0.5):
+        return replace(
+            DUMMY_TELEM_ROW,
+            device_id=device_id,
+            local_interval_start_time=datetime(2025, 10, 6, hour, minute),
+            schedule_offset_celsius=offset,
+        )
+
+    # devices interleaved; dev1 has a > 15 min gap, dev2 a NaN offset interval
+    rows = [
+        row("dev1", 12, 0),
+        row("dev2", 12, 0),
+        row("dev1", 12, 15),
+        row("dev2", 12, 15, float("nan")),
+        row("dev2", 12, 30),
+        row("dev1", 13, 0),
+    ]
+    df = personalizer._get_offset_events(personalizer._rows_to_df(rows))
+    events = [
+        (r.device_id, r.offset_start, r.offset_end) for r in df.itertuples(index=False)
+    ]
+    assert events == [
+        ("dev1", datetime(2025, 10, 6, 12, 0), datetime(2025, 10, 6, 12, 30)),
+        ("dev1", datetime(2025, 10, 6, 13, 0), datetime(2025, 10, 6, 13, 15)),
+        ("dev2", datetime(2025, 10, 6, 12, 0), datetime(2025, 10, 6, 12, 15)),
+        ("dev2", datetime(2025, 10, 6, 12, 30), datetime(2025, 10, 6, 12, 45)),
+    ]
+
+
 def test_compute_metrics_no_overrides():
     personalizer = Personalizer()
     metrics = personalizer.compute_metrics(
@@ -65,6 +143,91 @@ def test_compute_metrics_no_overrides():
     assert metrics["override_rate"] == 0.0
 
 
+def test_compute_metrics_empty_inputs():
+    personalizer = Personalizer()
+    metrics = personalizer.compute_metrics(telem_rows=[], dial_turn_rows=[])
+    assert metrics == {"n_offset_events": 0, "override_rate": 0.0, "n_overrides": 0}
+
+
+# one event [12:00, 13:00) and one event [14:00, 14:30) on 2025-10-06
+TWO_EVENT_ROWS = offset_rows(datetime(2025, 10, 6, 12, 0), 4) + offset_rows(
+    datetime(2025, 10, 6, 14, 0), 2
+)
+TWO_EVENT_AS_OF = datetime(2025, 10, 7)
+
+
+@pytest.mark.parametrize(
+    "dial_time,expected_overrides",
+    [
+        # more than INTERVAL_MIN into a multi-interval event still counts
+        (datetime(2025, 10, 6, 12, 40), 1),
+        # offset_end is exclusive
+        (datetime(2025, 10, 6, 13, 0), 0),
+        # between events
+        (datetime(2025, 10, 6, 13, 30), 0),
+    ],
+)
+def test_compute_metrics_override_window(dial_time, expected_overrides):
+    personalizer = Personalizer()
+    metrics = personalizer.compute_metrics(
+        telem_rows=TWO_EVENT_ROWS,
+        dial_turn_rows=[dial_row(dial_time)],
+        as_of=TWO_EVENT_AS_OF,
+    )
+    assert metrics["n_offset_events"] == 2
+    assert metrics["n_overrides"] == expected_overrides
+
+
+def test_compute_metrics_override_before_lookback():
+    personalizer = Personalizer(lookback_days=1)
+    # cutoff is 2025-10-06 12:00, so the 11:45 interval and 11:50 dial turn drop out
+    metrics = personalizer.compute_metrics(
+        telem_rows=offset_rows(datetime(2025, 10, 6, 11, 45), 4),
+        dial_turn_rows=[dial_row(datetime(2025, 10, 6, 11, 50))],
+        as_of=datetime(2025, 10, 7, 12, 0),
+    )
+    assert metrics["n_offset_events"] == 1
+    assert metrics["n_overrides"] == 0
+    assert metrics["override_rate"] == 0.0
+
+
+def test_compute_metrics_ewma_rate():
+    personalizer = Personalizer(ewma_half_life_days=7)
+    metrics = personalizer.compute_metrics(
+        telem_rows=TWO_EVENT_ROWS,
+        dial_turn_rows=[dial_row(datetime(2025, 10, 6, 12, 40))],
+        as_of=TWO_EVENT_AS_OF,
+    )
+    # event ages in half-lives, only the first (older) event is overridden
+    a = 12 / 24 / 7
+    b = 10 / 24 / 7
+    assert metrics["n_overrides"] == 1
+    assert metrics["override_rate"] == pytest.approx(2**-a / (2**-a + 2**-b))
+
+
+def test_compute_metrics_unsorted_input():
+    personalizer = Personalizer()
+    dial_rows = [
+        dial_row(datetime(2025, 10, 6, 12, 40)),
+        dial_row(datetime(2025, 10, 6, 14, 10)),
+        dial_row(datetime(2025, 10, 6, 13, 30)),
+    ]
+    expected = personalizer.compute_metrics(
+        telem_rows=TWO_EVENT_ROWS,
+        dial_turn_rows=sorted(dial_rows, key=lambda r: r.local_dial_turn_time),
+        as_of=TWO_EVENT_AS_OF,
+    )
+    shuffled_telem = TWO_EVENT_ROWS[::-1]
+    shuffled_telem[1], shuffled_telem[3] = shuffled_telem[3], shuffled_telem[1]
+    metrics = personalizer.compute_metrics(
+        telem_rows=shuffled_telem,
+        dial_turn_rows=dial_rows[::-1],
+        as_of=TWO_EVENT_AS_OF,
+    )
+    assert expected["n_overrides"] == 2
+    assert metrics == expected
+
+
 def test_calculate_preference():
     personalizer = Personalizer()
     pref = personalizer.calculate_preference(
@@ -75,10 +238,80 @@ def test_calculate_preference():
     assert "metrics" in pref
 
 
+def test_calculate_preferences_batch():
+    personalizer = Personalizer()
+    as_of = datetime(2025, 10, 7)
+    telem_by_dev = {
+        "dev1": [
+            DUMMY_TELEM_ROW,
+            replace(
+                DUMMY_TELEM_ROW, local_interval_start_time=datetime(2025, 10, 6, 18)
+            ),
+        ],
+        "dev2": [replace(DUMMY_TELEM_ROW, device_id="dev2")],
+        "dev3": [],
+    }
+    dial_by_dev = {
+        "dev1": [
+            DialTurns(
+                device_id="dev1",
+                local_dial_turn_time=datetime(2025, 10, 6, 12, 5),
+                schedule_offset_celsius=0.5,
+                initial_cooling_target_temperature_celsius=22.0,
+                final_cooling_target_temperature_celsius=21.0,
+            )
+        ],
+    }
+    prefs = personalizer.calculate_preferences_batch(telem_by_dev, dial_by_dev, as_of)
+    assert list(prefs) == ["dev1", "dev2", "dev3"]
+    for device_id, pref in prefs.items():
+        expected = personalizer.calculate_preference(
+            telem_by_dev[device_id], dial_by_dev.get(device_id, []), as_of=as_of
+        )
+        assert pref == expected
+    assert prefs["dev1"]["metrics"]["n_overrides"] == 1
+    assert prefs["dev2"]["metrics"]["n_overrides"] == 0
+
+
+def test_resolve_as_of_uses_first_device_with_rows():
+    personalizer = Personalizer()
+    tz = timezone(timedelta(hours=-7))
+    aware_row = replace(
+        DUMMY_TELEM_ROW, local_interval_start_time=datetime(2025, 10, 6, 12, tzinfo=tz)
+    )
+    as_of = personalizer.resolve_as_of({"dev1": [], "dev2": [aware_row]})
+    assert as_of.tzinfo == tz
+
+
+def test_as_of_tz_mismatch():
+    personalizer = Personalizer()
+    aware_as_of = datetime(2025, 10, 7, tzinfo=timezone.utc)
+    with pytest.raises(ValueError):
+        personalizer.compute_metrics([DUMMY_TELEM_ROW], [], aware_as_of)
+    with pytest.raises(ValueError):
+        personalizer.calculate_preferences_batch(
+            {"dev1": [DUMMY_TELEM_ROW]}, {}, aware_as_of
+        )
+
+
+def test_calculate_preferences_threaded():
+    personalizer = Personalizer()
+    as_of = datetime(2025, 10, 7)
+    telem_by_dev = {
+        f"dev{i}": [replace(DUMMY_TELEM_ROW, device_id=f"dev{i}")] for i in range(5)
+    }
+    prefs = personalizer.calculate_preferences_threaded(
+        telem_by_dev, {}, as_of, max_workers=2
+    )
+    assert prefs == personalizer.calculate_preferences_batch(telem_by_dev, {}, as_of)
+
+
 @pytest.mark.parametrize(
     "metrics,expected_label",
     [
         ({"override_rate": 0.6, "n_offset_events": 10}, "L"),
+        ({"override_rate": 0.5, "n_offset_events": 10}, "L"),
+        ({"override_rate": 0.25, "n_offset_events": 10}, "M"),
         ({"override_rate": 0.3, "n_offset_events": 10}, "M"),
         ({"override_rate": 0.1, "n_offset_events": 10}, "H"),
     ],
@@ -90,8 +323,6 @@ def test_score_tolerance_from_metrics(metrics, expected_label):
 
 
 # TODO add more tests for edge cases and different scenarios, including:
-# both telem and dial data empty
 # zero active offsets, small number of offsets
 # overrides outside of offset window
 # compute metrics on data that contains gaps
-# handling empty inputs
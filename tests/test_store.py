@@ -1,6 +1,14 @@
 from datetime import datetime
 
-from store import DevicePreference, DevicePreferenceStore, retrieve_preferences
+import numpy as np
+from personalizer import Personalizer
+from store import (
+    DevicePreference,
+    DevicePreferenceStore,
+    Telemetry,
+    precompute_preferences,
+    retrieve_preferences,
+)
 
 
 def test_retrieve_preferences():
@@ -34,9 +42,82 @@ def test_retrieve_preferences():
     assert prefs[1]["last_updated"] >= now
 
 
+def test_retrieve_preferences_missing_device():
+    store = DevicePreferenceStore()
+    prefs = retrieve_preferences(store, ["dev1", "dev2"])
+
+    assert [p["device_id"] for p in prefs] == ["dev1", "dev2"]
+    assert prefs[0] == {
+        "device_id": "dev1",
+        "offset_celsius": 0.5,
+        "tolerance_label": "L",
+        "confidence": 0.0,
+        "last_updated": None,
+    }
+    assert prefs[0] is not prefs[1]
+
+
+def test_batch_get_arrays():
+    store = DevicePreferenceStore()
+    now = datetime.now()
+    store.store["dev1"] = DevicePreference(
+        device_id="dev1",
+        tolerance_label="H",
+        offset_celsius=0.8,
+        confidence=0.9,
+        last_updated=now,
+    )
+    arrays = store.batch_get_arrays(["dev1", "missing"])
+
+    assert arrays["offset_celsius"].tolist() == [0.8, 0.5]
+    assert arrays["tolerance_label"].tolist() == ["H", "L"]
+    assert arrays["confidence"].tolist() == [0.9, 0.0]
+    assert arrays["last_updated"][0] == np.datetime64(now)
+    assert np.isnat(arrays["last_updated"][1])
+
+
+def test_update_batch():
+    store = DevicePreferenceStore()
+    now = datetime(2025, 10, 7)
+    store.update("dev1", {"label": "L", "offset_celsius": 0.5})
+    store.update_batch(
+        [
+            ("dev1", {"label": "H", "offset_celsius": 0.8}),
+            ("dev2", {"label": "M", "offset_celsius": 0.7, "confidence": 0.5}),
+        ],
+        now=now,
+    )
+
+    assert store.get("dev1").tolerance_label == "H"
+    assert store.get("dev1").last_updated == now
+    assert store.get("dev2").confidence == 0.5
+    assert store.get("dev2").last_updated == now
+
+
+def test_precompute_preferences():
+    telem_data = {
+        "dev1": [
+            Telemetry(
+                device_id="dev1",
+                local_interval_start_time=datetime(2025, 10, 6, 12, 0),
+                cooling_target_temperature_celsius=22.0,
+                indoor_temperature_celsius=23.0,
+                outdoor_temperature_celsius=30.0,
+                duration_user_home_seconds=900,
+                duration_cooling_seconds=300,
+                schedule_offset_celsius=0.5,
+            )
+        ]
+    }
+    store = precompute_preferences(
+        Personalizer(), telem_data, {}, as_of=datetime(2025, 10, 7)
+    )
+    pref = store.get("dev1")
+    assert pref.tolerance_label == "H"
+    assert pref.offset_celsius == 0.8
+
+
 # TODO add test cases for:
-# retrieving preferences for a device without any stored preference
 # retrieving preferences for a device with a stale preference (old last_updated)
-# overwrite a preference and ensure it's updated correctly
 # list of device_ids where some missing are in store
 # handling empty inputs